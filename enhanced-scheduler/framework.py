@@ -0,0 +1,639 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from kubernetes.utils import parse_quantity
+
+# -----------------------------
+# Constantes del framework
+# -----------------------------
+MAX_NODE_SCORE = 100
+CONTROL_PLANE_LABEL = "node-role.kubernetes.io/control-plane"
+
+# Puntos de extensión, en el orden en que se ejecutan en un ciclo de scheduling
+EXTENSION_POINTS = ("pre_filter", "filter", "score", "normalize_score", "reserve", "bind")
+PHASE_NAMES = {
+    "pre_filter": "PreFilter",
+    "filter": "Filter",
+    "score": "Score",
+    "normalize_score": "NormalizeScore",
+    "reserve": "Reserve",
+    "unreserve": "Unreserve",
+    "bind": "Bind",
+}
+
+# Perfil por defecto: reproduce la política del scheduler mejorado
+# (nodos env=prod, tolerancia a taints, requests que entran en el nodo,
+# 60% carga + 40% dispersión)
+DEFAULT_PROFILE = {
+    "parallelism": 1,
+    "chunk_size": 16,
+    "metrics_report_every": 50,
+    "plugins": [
+        {"name": "NodeLabels", "args": {"required_labels": {"env": "prod"}}},
+        {"name": "TaintToleration"},
+        {"name": "NodeResourcesFit"},
+        {"name": "LeastLoaded", "weight": 0.6},
+        {"name": "PodSpread", "weight": 0.4},
+        {"name": "NodeAssume"},
+        {"name": "DefaultBinder"},
+    ],
+}
+
+
+def load_profile(path=None):
+    """
+    Carga un perfil JSON. Las claves ausentes toman el valor del perfil por defecto.
+    """
+    profile = json.loads(json.dumps(DEFAULT_PROFILE))
+    if path:
+        with open(path) as f:
+            profile.update(json.load(f))
+    return profile
+
+
+def pod_key(pod):
+    return f"{pod.metadata.namespace}/{pod.metadata.name}"
+
+
+def pod_terminated(pod):
+    return getattr(pod.status, "phase", None) in ("Succeeded", "Failed")
+
+
+# -----------------------------
+# Capa de "assume": pods reservados aún no visibles como bindeados
+# -----------------------------
+class AssumeCache:
+    """
+    Guarda los pods que el scheduler ya asignó a un nodo pero que todavía no
+    aparecen con spec.node_name en el listado del API server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._assumed = {}
+
+    def assume(self, pod, node_name):
+        with self._lock:
+            self._assumed[pod_key(pod)] = (pod, node_name)
+
+    def forget(self, pod):
+        with self._lock:
+            self._assumed.pop(pod_key(pod), None)
+
+    def cleanup(self, pods):
+        # Descarta los pods que el API server ya reporta bindeados y los que
+        # ya no existen (borrados o terminados antes de verse bindeados)
+        pending = {pod_key(p) for p in pods if not p.spec.node_name}
+        with self._lock:
+            for key in self._assumed.keys() - pending:
+                del self._assumed[key]
+
+    def assumed_pods(self):
+        with self._lock:
+            return list(self._assumed.values())
+
+
+class Snapshot:
+    """
+    Vista del cluster para un ciclo de scheduling: nodos y pods por nodo,
+    incluyendo los pods asumidos.
+    """
+
+    def __init__(self, nodes, pods, assumed=(), requests_cache=None):
+        self.nodes = nodes
+        self.pods = pods
+        self._requests = {} if requests_cache is None else requests_cache
+        self._requested = {}
+        self.pods_by_node = {}
+        for p in pods:
+            if p.spec.node_name:
+                self.pods_by_node.setdefault(p.spec.node_name, []).append(p)
+        for p, node_name in assumed:
+            self.pods_by_node.setdefault(node_name, []).append(p)
+
+    def add_pod(self, pod, node_name):
+        # Refleja en el snapshot un pod reservado durante el mismo ciclo
+        self.pods_by_node.setdefault(node_name, []).append(pod)
+        self._requested.pop(node_name, None)
+
+    def remove_pod(self, pod, node_name):
+        pods = self.pods_by_node.get(node_name, [])
+        if pod in pods:
+            pods.remove(pod)
+        self._requested.pop(node_name, None)
+
+    def pods_on(self, node_name):
+        return self.pods_by_node.get(node_name, [])
+
+    def requests_of(self, pod):
+        # Requests del pod; el cache se comparte entre ciclos (ver Framework.snapshot)
+        uid = pod.metadata.uid
+        if uid not in self._requests:
+            self._requests[uid] = pod_requests(pod)
+        return self._requests[uid]
+
+    def requested_on(self, node_name):
+        # Suma de requests de los pods activos del nodo; se recalcula solo si
+        # add_pod/remove_pod cambiaron ese nodo
+        if node_name not in self._requested:
+            used = {}
+            for p in self.pods_on(node_name):
+                if pod_terminated(p):
+                    continue
+                for name, value in self.requests_of(p).items():
+                    used[name] = used.get(name, 0) + value
+            self._requested[node_name] = used
+        return self._requested[node_name]
+
+    def placed_pods(self):
+        # Pods bindeados o asumidos en algún nodo
+        for pods in self.pods_by_node.values():
+            yield from pods
+
+
+class ScheduleResult:
+    def __init__(self, node_name, score, feasible_nodes, evaluated_nodes):
+        self.node_name = node_name
+        self.score = score
+        self.feasible_nodes = feasible_nodes
+        self.evaluated_nodes = evaluated_nodes
+
+
+# -----------------------------
+# Métricas por plugin
+# -----------------------------
+def _observe(timings, phase, plugin_name, seconds):
+    calls, total = timings.get((phase, plugin_name), (0, 0.0))
+    timings[(phase, plugin_name)] = (calls + 1, total + seconds)
+
+
+def merge_timings(dst, src):
+    for key, (calls, total) in src.items():
+        prev_calls, prev_total = dst.get(key, (0, 0.0))
+        dst[key] = (prev_calls + calls, prev_total + total)
+
+
+class PluginMetrics:
+    """
+    Tiempo acumulado por (fase, plugin), seguro entre hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def merge(self, timings):
+        with self._lock:
+            merge_timings(self._timings, timings)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._timings)
+
+
+def format_timings(timings):
+    lines = []
+    for (phase, plugin_name), (calls, total) in sorted(timings.items()):
+        lines.append(f"{phase}/{plugin_name}: {calls} calls, {total * 1000:.2f} ms")
+    return lines
+
+
+# -----------------------------
+# Registro de plugins
+# -----------------------------
+PLUGIN_REGISTRY = {}
+
+
+def register_plugin(cls):
+    """
+    Decorador que registra un plugin bajo su atributo `name`.
+    """
+    PLUGIN_REGISTRY[cls.name] = cls
+    return cls
+
+
+class Plugin:
+    """
+    Clase base. Un plugin participa en cada punto de extensión cuyo método define:
+
+      pre_filter(state, pod) -> bool
+      filter(state, pod, node) -> bool
+      score(state, pod, node) -> number
+      normalize_score(state, pod, scores)   # scores: {node_name: score}, in-place
+      reserve(state, pod, node_name) / unreserve(state, pod, node_name)
+      bind(state, pod, node_name) -> bool
+    """
+
+    name = None
+
+    def __init__(self, args, handle):
+        self.args = args or {}
+        self.handle = handle
+
+
+def node_matches_labels(node, required_labels):
+    node_labels = node.metadata.labels or {}
+    return all(node_labels.get(key) == value for key, value in required_labels.items())
+
+
+@lru_cache(maxsize=4096)
+def quantity(value):
+    # Las cantidades ("500m", "4Gi", ...) se repiten mucho entre pods y nodos
+    return float(parse_quantity(value))
+
+
+def pod_requests(pod):
+    # Suma de requests de los contenedores; los init containers corren de a
+    # uno, así que solo cuenta el mayor de cada recurso
+    totals = {"pods": 1}
+    for container in pod.spec.containers or []:
+        requests = (container.resources and container.resources.requests) or {}
+        for name, value in requests.items():
+            totals[name] = totals.get(name, 0) + quantity(value)
+    for container in pod.spec.init_containers or []:
+        requests = (container.resources and container.resources.requests) or {}
+        for name, value in requests.items():
+            totals[name] = max(totals.get(name, 0), quantity(value))
+    return totals
+
+
+def node_tolerates_taints(node, pod):
+    # Chequeo si el pod tolera todos los taints del nodo
+    taints = node.spec.taints or []
+    tolerations = pod.spec.tolerations or []
+
+    for taint in taints:
+        tolerated = False
+        for tol in tolerations:
+            key_match = tol.key == taint.key
+            effect_match = (tol.effect == taint.effect or tol.effect == "NoExecute" or tol.effect is None)
+            if tol.operator == "Exists":
+                if key_match and effect_match:
+                    tolerated = True
+                    break
+            elif tol.operator == "Equal":
+                if key_match and effect_match and tol.value == taint.value:
+                    tolerated = True
+                    break
+        if not tolerated:
+            print(f"Node {node.metadata.name} rejected due to taint {taint.key}={taint.value}:{taint.effect}")
+            return False
+
+    return True
+
+
+@register_plugin
+class NodeLabels(Plugin):
+    """Filtra nodos que no tienen todas las etiquetas `required_labels`."""
+
+    name = "NodeLabels"
+
+    def filter(self, state, pod, node):
+        return node_matches_labels(node, self.args.get("required_labels", {}))
+
+
+@register_plugin
+class TaintToleration(Plugin):
+    """Filtra nodos con taints que el pod no tolera."""
+
+    name = "TaintToleration"
+
+    def filter(self, state, pod, node):
+        return node_tolerates_taints(node, pod)
+
+
+@register_plugin
+class NodeReady(Plugin):
+    """Filtra nodos que no están Ready y, por defecto, los nodos control-plane."""
+
+    name = "NodeReady"
+
+    def filter(self, state, pod, node):
+        labels = node.metadata.labels or {}
+        if self.args.get("exclude_control_plane", True) and CONTROL_PLANE_LABEL in labels:
+            return False
+        conditions = {c.type: c.status for c in (node.status.conditions or [])}
+        return conditions.get("Ready") == "True"
+
+
+@register_plugin
+class NodeResourcesFit(Plugin):
+    """
+    Filtra nodos donde los requests del pod, sumados a los de los pods ya
+    bindeados o asumidos en el snapshot, superan el allocatable del nodo.
+    """
+
+    name = "NodeResourcesFit"
+
+    def filter(self, state, pod, node):
+        allocatable = node.status.allocatable if node.status else None
+        if not allocatable:
+            return True
+        snapshot = state["snapshot"]
+        used = snapshot.requested_on(node.metadata.name)
+        for name, value in snapshot.requests_of(pod).items():
+            if not value:
+                continue
+            capacity = quantity(allocatable[name]) if name in allocatable else 0
+            if used.get(name, 0) + value > capacity:
+                print(f"Node {node.metadata.name} rejected due to insufficient {name}")
+                return False
+        return True
+
+
+@register_plugin
+class LeastLoaded(Plugin):
+    """Penaliza nodos con más pods (10 puntos por pod)."""
+
+    name = "LeastLoaded"
+
+    def score(self, state, pod, node):
+        pod_count = len(state["snapshot"].pods_on(node.metadata.name))
+        return max(0, MAX_NODE_SCORE - pod_count * self.args.get("penalty_per_pod", 10))
+
+
+@register_plugin
+class PodSpread(Plugin):
+    """Favorece nodos con menos pods que comparten la etiqueta `app` del pod."""
+
+    name = "PodSpread"
+
+    def pre_filter(self, state, pod):
+        labels = pod.metadata.labels or {}
+        keys = self.args.get("label_keys", ["app"])
+        state["spread_labels"] = {k: labels[k] for k in keys if k in labels}
+        return True
+
+    def score(self, state, pod, node):
+        spread_labels = state.get("spread_labels")
+        if not spread_labels:
+            return 50  # Puntaje base si no hay política de dispersión
+
+        running_pods = state["snapshot"].pods_on(node.metadata.name)
+        if not running_pods:
+            return MAX_NODE_SCORE
+
+        similar_pod_count = sum(
+            1 for p in running_pods if node_matches_labels(p, spread_labels)
+        )
+        return max(0, MAX_NODE_SCORE - similar_pod_count * 20)
+
+
+@register_plugin
+class NodeAssume(Plugin):
+    """Registra el pod en la AssumeCache hasta que el binding sea visible."""
+
+    name = "NodeAssume"
+
+    def reserve(self, state, pod, node_name):
+        self.handle.assume_cache.assume(pod, node_name)
+
+    def unreserve(self, state, pod, node_name):
+        self.handle.assume_cache.forget(pod)
+
+
+@register_plugin
+class DefaultBinder(Plugin):
+    """Hace el binding con la función `bind_fn` que recibe el framework."""
+
+    name = "DefaultBinder"
+
+    def bind(self, state, pod, node_name):
+        self.handle.bind_fn(self.handle.api, pod, node_name)
+        return True
+
+
+# -----------------------------
+# Motor del framework
+# -----------------------------
+class Framework:
+    """
+    Ejecuta los plugins de un perfil. Filter y Score se evalúan por bloques de
+    nodos (`chunk_size`) en un pool de `parallelism` hilos. Por el GIL, los
+    hilos solo ayudan con plugins que hacen I/O; con los plugins incluidos,
+    que son Python puro, conviene dejar `parallelism` en 1.
+    """
+
+    def __init__(self, profile, api=None, bind_fn=None, assume_cache=None):
+        self.api = api
+        self.bind_fn = bind_fn
+        self.assume_cache = assume_cache or AssumeCache()
+        self.parallelism = max(1, int(profile.get("parallelism", 1)))
+        self.chunk_size = max(1, int(profile.get("chunk_size", 16)))
+        self.metrics = PluginMetrics()
+        self._requests_cache = {}
+        self.metrics_report_every = max(0, int(profile.get("metrics_report_every", 0)))
+        self._cycles = 0
+
+        self.plugins = {point: [] for point in EXTENSION_POINTS}
+        self.weights = {}
+        for entry in profile.get("plugins", []):
+            plugin_cls = PLUGIN_REGISTRY.get(entry["name"])
+            if plugin_cls is None:
+                raise ValueError(f"Unknown plugin: {entry['name']}")
+            plugin = plugin_cls(entry.get("args"), self)
+            for point in EXTENSION_POINTS:
+                if callable(getattr(plugin, point, None)):
+                    self.plugins[point].append(plugin)
+            if callable(getattr(plugin, "score", None)):
+                self.weights[plugin.name] = entry.get("weight", 1)
+
+        if not self.plugins["bind"]:
+            raise ValueError("Profile must enable at least one Bind plugin")
+
+        self._pool = ThreadPoolExecutor(max_workers=self.parallelism) if self.parallelism > 1 else None
+        print("Framework plugins: " + ", ".join(
+            f"{PHASE_NAMES[point]}=[{', '.join(p.name for p in self.plugins[point])}]"
+            for point in EXTENSION_POINTS
+        ))
+
+    def snapshot(self):
+        nodes = self.api.list_node().items
+        pods = self.api.list_pod_for_all_namespaces().items
+        self.assume_cache.cleanup(pods)
+        assumed = self.assume_cache.assumed_pods()
+        # Los requests de un pod no cambian: se conservan entre ciclos los de
+        # los pods que siguen existiendo
+        listed = {p.metadata.uid for p in pods} | {p.metadata.uid for p, node_name in assumed}
+        for uid in self._requests_cache.keys() - listed:
+            del self._requests_cache[uid]
+        return Snapshot(nodes, pods, assumed, self._requests_cache)
+
+    def _parallelize(self, fn, items):
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        if self._pool is None or len(chunks) < 2:
+            return [fn(chunk) for chunk in chunks]
+        # map conserva el orden de los bloques, así el desempate es determinista
+        return list(self._pool.map(fn, chunks))
+
+    def _timed(self, state, phase, plugin, method, *args):
+        start = time.perf_counter()
+        try:
+            return getattr(plugin, method)(state, *args)
+        finally:
+            _observe(state["timings"], phase, plugin.name, time.perf_counter() - start)
+
+    # --- PreFilter / Filter ---
+    def run_pre_filter(self, state, pod):
+        for plugin in self.plugins["pre_filter"]:
+            if not self._timed(state, "PreFilter", plugin, "pre_filter", pod):
+                raise RuntimeError(f"PreFilter {plugin.name} rejected pod {pod.metadata.name}")
+
+    def _filter_chunk(self, state, pod, nodes):
+        timings = {}
+        feasible = []
+        rejected = {}
+        for node in nodes:
+            for plugin in self.plugins["filter"]:
+                start = time.perf_counter()
+                ok = plugin.filter(state, pod, node)
+                _observe(timings, "Filter", plugin.name, time.perf_counter() - start)
+                if not ok:
+                    rejected[plugin.name] = rejected.get(plugin.name, 0) + 1
+                    break
+            else:
+                feasible.append(node)
+        return feasible, rejected, timings
+
+    def run_filter(self, state, pod, nodes):
+        feasible = []
+        rejected = {}
+        for chunk_feasible, chunk_rejected, timings in self._parallelize(
+            lambda chunk: self._filter_chunk(state, pod, chunk), nodes
+        ):
+            feasible.extend(chunk_feasible)
+            for name, count in chunk_rejected.items():
+                rejected[name] = rejected.get(name, 0) + count
+            merge_timings(state["timings"], timings)
+
+        detail = ", ".join(f"{name}={count}" for name, count in rejected.items()) or "none"
+        print(f"Filtering: {len(nodes)} -> {len(feasible)} nodes (rejected by: {detail})")
+        return feasible
+
+    # --- Score / NormalizeScore ---
+    def _score_chunk(self, state, pod, nodes):
+        timings = {}
+        scores = {plugin.name: {} for plugin in self.plugins["score"]}
+        for node in nodes:
+            for plugin in self.plugins["score"]:
+                start = time.perf_counter()
+                scores[plugin.name][node.metadata.name] = plugin.score(state, pod, node)
+                _observe(timings, "Score", plugin.name, time.perf_counter() - start)
+        return scores, timings
+
+    def run_score(self, state, pod, nodes):
+        scores = {plugin.name: {} for plugin in self.plugins["score"]}
+        for chunk_scores, timings in self._parallelize(
+            lambda chunk: self._score_chunk(state, pod, chunk), nodes
+        ):
+            for name, node_scores in chunk_scores.items():
+                scores[name].update(node_scores)
+            merge_timings(state["timings"], timings)
+
+        normalizers = {plugin.name: plugin for plugin in self.plugins["normalize_score"]}
+        for name, node_scores in scores.items():
+            if name in normalizers:
+                self._timed(state, "NormalizeScore", normalizers[name], "normalize_score", pod, node_scores)
+            for node_name, value in node_scores.items():
+                node_scores[node_name] = min(MAX_NODE_SCORE, max(0, value))
+
+        totals = {}
+        for node in nodes:
+            node_name = node.metadata.name
+            totals[node_name] = sum(self.weights[name] * scores[name][node_name] for name in scores)
+            detail = ", ".join(f"{name}={scores[name][node_name]}" for name in scores)
+            print(f"Node {node_name}: {detail}, total={totals[node_name]:.1f}")
+        return totals
+
+    def schedule(self, pod, state=None):
+        """
+        Ejecuta PreFilter, Filter y Score y devuelve un ScheduleResult.
+        Si `state` trae un "snapshot" se reutiliza en lugar de listar el cluster.
+        """
+        if state is None:
+            state = {}
+        state.setdefault("timings", {})
+        if "snapshot" not in state:
+            state["snapshot"] = self.snapshot()
+        nodes = state["snapshot"].nodes
+        if not nodes:
+            raise RuntimeError("No nodes available")
+
+        self.run_pre_filter(state, pod)
+        feasible = self.run_filter(state, pod, nodes)
+        if not feasible:
+            raise RuntimeError("No nodes match filtering criteria")
+
+        if len(feasible) == 1 or not self.plugins["score"]:
+            return ScheduleResult(feasible[0].metadata.name, 0, len(feasible), len(nodes))
+
+        totals = self.run_score(state, pod, feasible)
+        best_node = None
+        best_score = -1
+        for node in feasible:
+            if totals[node.metadata.name] > best_score:
+                best_score = totals[node.metadata.name]
+                best_node = node.metadata.name
+        if not best_node:
+            raise RuntimeError("Failed to select a node")
+        return ScheduleResult(best_node, best_score, len(feasible), len(nodes))
+
+    # --- Reserve / Bind ---
+    def run_unreserve(self, state, pod, node_name, plugins=None):
+        for plugin in reversed(self.plugins["reserve"] if plugins is None else plugins):
+            if callable(getattr(plugin, "unreserve", None)):
+                try:
+                    self._timed(state, "Unreserve", plugin, "unreserve", pod, node_name)
+                except Exception as e:
+                    print(f"[WARNING] Unreserve {plugin.name} failed for pod {pod.metadata.name}: {e}")
+
+    def run_reserve(self, state, pod, node_name):
+        done = []
+        for plugin in self.plugins["reserve"]:
+            try:
+                self._timed(state, "Reserve", plugin, "reserve", pod, node_name)
+            except Exception:
+                self.run_unreserve(state, pod, node_name, done + [plugin])
+                raise
+            done.append(plugin)
+
+    def run_bind(self, state, pod, node_name):
+        for plugin in self.plugins["bind"]:
+            if self._timed(state, "Bind", plugin, "bind", pod, node_name):
+                return
+        raise RuntimeError(f"No Bind plugin handled pod {pod.metadata.name}")
+
+    def schedule_and_bind(self, pod):
+        """
+        Ciclo completo para un pod: schedule, reserve y bind. Si el bind falla
+        se deshace la reserva. Devuelve el nombre del nodo elegido.
+        """
+        state = {"timings": {}}
+        try:
+            result = self.schedule(pod, state)
+            self.run_reserve(state, pod, result.node_name)
+            try:
+                self.run_bind(state, pod, result.node_name)
+            except Exception:
+                self.run_unreserve(state, pod, result.node_name)
+                raise
+            return result.node_name
+        finally:
+            self.report(state["timings"])
+
+    def report(self, timings):
+        self.metrics.merge(timings)
+        for line in format_timings(timings):
+            print(f"[METRICS] {line}")
+        self._cycles += 1
+        if self.metrics_report_every and self._cycles % self.metrics_report_every == 0:
+            self.report_totals()
+
+    def report_totals(self):
+        # Totales acumulados desde el arranque del scheduler
+        print(f"[METRICS] Totals after {self._cycles} scheduling cycles:")
+        for line in format_timings(self.metrics.snapshot()):
+            print(f"[METRICS]   {line}")
@@ -0,0 +1,248 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from framework import merge_timings, pod_terminated
+
+# -----------------------------
+# Etiquetas de pod group
+# -----------------------------
+POD_GROUP_LABEL = "scheduling.x-k8s.io/pod-group"
+MIN_MEMBER_LABEL = "scheduling.x-k8s.io/min-member"
+MAX_BIND_WORKERS = 32
+# Cada cuánto se vuelve a contar contra el cluster un grupo sin quórum local
+QUORUM_RECHECK_SECONDS = 5.0
+
+
+def pod_group_of(pod):
+    """
+    Devuelve la clave namespace/grupo del pod, o None si no pertenece a un grupo.
+    """
+    labels = pod.metadata.labels or {}
+    name = labels.get(POD_GROUP_LABEL)
+    if not name:
+        return None
+    return f"{pod.metadata.namespace}/{name}"
+
+
+def min_member_of(pod):
+    labels = pod.metadata.labels or {}
+    value = labels.get(MIN_MEMBER_LABEL, "1")
+    try:
+        min_member = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid {MIN_MEMBER_LABEL}={value!r} on pod {pod.metadata.name}")
+    return max(1, min_member)
+
+
+class PodGroup:
+    def __init__(self, key, min_member):
+        self.key = key
+        self.min_member = min_member
+        # Miembros pendientes por metadata.uid: un pod recreado con el mismo
+        # nombre es un miembro nuevo
+        self.pods = {}
+        self.first_seen = time.monotonic()
+        self.attempts = 0
+        self.backoff_until = 0.0
+        # Último chequeo de quórum contra un snapshot
+        self.checked_at = 0.0
+        # Binds o rollbacks de un intento fallido que siguen en curso
+        self.in_flight = set()
+
+
+# -----------------------------
+# Cola de grupos pendientes
+# -----------------------------
+class GangQueue:
+    """
+    Junta los pods pendientes de cada grupo. El quórum (min-member) cuenta los
+    pendientes más los miembros que el snapshot ya muestra bindeados o asumidos,
+    así los miembros que llegan tarde (reemplazos de un Job, etc.) se colocan
+    aunque el resto del grupo ya esté corriendo.
+    Un grupo que falla o no completa su quórum dentro de `timeout` entra en
+    backoff exponencial (`base_backoff` * 2^n, hasta `max_backoff`).
+    """
+
+    def __init__(self, timeout=30.0, base_backoff=1.0, max_backoff=60.0):
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.groups = {}
+
+    def add(self, pod):
+        key = pod_group_of(pod)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = PodGroup(key, min_member_of(pod))
+        group.pods[pod.metadata.uid] = pod
+
+    def remove(self, pod):
+        group = self.groups.get(pod_group_of(pod))
+        if group is None:
+            return
+        group.pods.pop(pod.metadata.uid, None)
+        if not group.pods and not group.in_flight:
+            del self.groups[group.key]
+
+    def backoff(self, group):
+        group.attempts += 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (group.attempts - 1))
+        group.backoff_until = time.monotonic() + delay
+        # La ventana de timeout vuelve a empezar al terminar el backoff
+        group.first_seen = group.backoff_until
+        print(f"[INFO] Pod group {group.key} backing off {delay:.1f}s (attempt {group.attempts})")
+
+    def done(self, group):
+        self.groups.pop(group.key, None)
+
+    def candidates(self):
+        """
+        Grupos fuera de backoff y sin rollbacks en curso que vale la pena
+        evaluar contra un snapshot: los que ya juntan min-member pendientes y,
+        cada QUORUM_RECHECK_SECONDS, los demás.
+        """
+        now = time.monotonic()
+        for group in list(self.groups.values()):
+            if not group.pods and not group.in_flight:
+                del self.groups[group.key]
+        return [
+            group for group in self.groups.values()
+            if group.pods and not group.in_flight and now >= group.backoff_until
+            and (len(group.pods) >= group.min_member
+                 or now - group.checked_at >= QUORUM_RECHECK_SECONDS)
+        ]
+
+    def reconcile(self, snapshot):
+        """
+        Descarta de todos los grupos los pods que ya no aparecen pendientes en
+        el listado del snapshot (p. ej. borrados durante un corte del watch).
+        """
+        for group in list(self.groups.values()):
+            self._prune(group, snapshot)
+            if not group.pods and not group.in_flight:
+                del self.groups[group.key]
+
+    def _prune(self, group, snapshot):
+        listed = {p.metadata.uid for p in snapshot.pods if not p.spec.node_name}
+        for uid in group.pods.keys() - listed:
+            del group.pods[uid]
+
+    def evaluate(self, group, snapshot):
+        """
+        Descarta del grupo los pods que el snapshot ya muestra colocados o que
+        ya no existen y devuelve True si pendientes + colocados llegan a min-member. Un grupo
+        que supera el timeout sin quórum pasa a backoff.
+        """
+        now = time.monotonic()
+        group.checked_at = now
+        self._prune(group, snapshot)
+        placed = {
+            p.metadata.uid for p in snapshot.placed_pods()
+            if pod_group_of(p) == group.key and not pod_terminated(p)
+        }
+        for uid in group.pods.keys() & placed:
+            del group.pods[uid]
+        if not group.pods:
+            self.done(group)
+            return False
+
+        members = len(group.pods) + len(placed)
+        if members >= group.min_member:
+            return True
+        if now - group.first_seen > self.timeout:
+            print(f"[WARNING] Pod group {group.key} has {members}/{group.min_member} "
+                  f"members after {self.timeout:.0f}s")
+            self.backoff(group)
+        return False
+
+
+# -----------------------------
+# Scheduling todo-o-nada de un grupo
+# -----------------------------
+def _rollback_member(fw, group, state, pod, node_name, future):
+    try:
+        _undo_member(fw, group, state, pod, node_name, future)
+    finally:
+        group.in_flight.discard(pod.metadata.uid)
+
+
+def _undo_member(fw, group, state, pod, node_name, future):
+    fw.run_unreserve(state, pod, node_name)
+    if future.cancelled() or future.exception() is not None:
+        return
+    # El binding no se puede deshacer: se borra el pod para liberar el nodo
+    # y que su controlador lo vuelva a crear como Pending. Un pod sin
+    # controlador se perdería, así que se deja bindeado (cuenta para el quórum
+    # del siguiente intento desde el snapshot)
+    if not pod.metadata.owner_references:
+        print(f"[WARNING] Pod {pod.metadata.name} has no controller; leaving it bound to {node_name}")
+        return
+    try:
+        fw.api.delete_namespaced_pod(pod.metadata.name, pod.metadata.namespace)
+        print(f"[INFO] Rolled back pod {pod.metadata.name} from {node_name}")
+    except Exception as e:
+        print(f"[ERROR] Failed rolling back pod {pod.metadata.name}: {e}")
+
+
+def schedule_gang(fw, group, timeout, snapshot):
+    """
+    Coloca todos los pods pendientes de `group` contra `snapshot`, reserva la
+    capacidad de todo el grupo en la AssumeCache y hace los binds en paralelo.
+    Si algún pod no se puede colocar o bindear antes de `timeout` segundos,
+    se deshacen todas las reservas y los binds ya hechos.
+    Devuelve {nombre_pod: nodo}.
+    """
+    pods = list(group.pods.values())
+    deadline = time.monotonic() + timeout
+    placements = []
+    timings = {}
+
+    try:
+        for pod in pods:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Timed out placing pod group after {len(placements)}/{len(pods)} pods")
+            state = {"snapshot": snapshot, "timings": {}}
+            placements.append((pod, None, state))
+            result = fw.schedule(pod, state)
+            fw.run_reserve(state, pod, result.node_name)
+            placements[-1] = (pod, result.node_name, state)
+            snapshot.add_pod(pod, result.node_name)
+    except Exception:
+        for pod, node_name, state in reversed(placements):
+            if node_name is not None:
+                fw.run_unreserve(state, pod, node_name)
+                snapshot.remove_pod(pod, node_name)
+            merge_timings(timings, state["timings"])
+        fw.report(timings)
+        raise
+
+    # Ráfaga de binds concurrentes
+    pool = ThreadPoolExecutor(max_workers=min(len(placements), MAX_BIND_WORKERS))
+    futures = {
+        pool.submit(fw.run_bind, state, pod, node_name): (pod, node_name, state)
+        for pod, node_name, state in placements
+    }
+    done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    pool.shutdown(wait=False)
+    failed = [f for f in done if f.exception() is not None]
+
+    for future in done:
+        merge_timings(timings, futures[future][2]["timings"])
+    fw.report(timings)
+
+    if failed or not_done:
+        # El grupo no vuelve a intentarse hasta que terminen todos los rollbacks
+        group.in_flight.update(pod.metadata.uid for pod, node_name, state in placements)
+        for future, (pod, node_name, state) in futures.items():
+            snapshot.remove_pod(pod, node_name)
+            future.cancel()
+            future.add_done_callback(
+                lambda f, p=pod, n=node_name, s=state: _rollback_member(fw, group, s, p, n, f)
+            )
+        raise RuntimeError(
+            f"Pod group bind failed: {len(failed)} errors, {len(not_done)} timed out "
+            f"(first error: {failed[0].exception() if failed else 'timeout'})"
+        )
+
+    return {pod.metadata.name: node_name for pod, node_name, state in placements}
+
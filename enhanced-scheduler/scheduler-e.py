@@ -5,6 +5,8 @@ import time
 import random
 from functools import wraps
 from kubernetes.client import V1Binding, V1ObjectMeta, V1ObjectReference
+from framework import Framework, load_profile
+from gang import GangQueue, pod_group_of, schedule_gang
 
 
 # -----------------------------
@@ -17,82 +19,6 @@ def load_client(kubeconfig=None):
         config.load_incluster_config()
     return client.CoreV1Api()
 
-# -----------------------------
-# Filtrar nodos por etiquetas
-# -----------------------------
-def filter_nodes_by_labels(api: client.CoreV1Api, required_labels: dict):
-    # Retorna solo nodos que tienen todas las etiquetas con los valores correctos
-    # Si no se requieren etiquetas, retorna todos los nodos
-    # Ejemplo de uso - hacer scheduling solo en nodos de producción
-    # required_labels = {"env": "prod", "tier": "backend"}
-    # filtered_nodes = filter_nodes_by_labels(api, pod, required_labels)
-
-    all_nodes = api.list_node().items
-    filtered_nodes = []
-    
-    # Chequeo cada nodo por etiquetas requeridas
-    for node in all_nodes:
-        node_labels = node.metadata.labels or {}
-        matches_all = True
-        # Verificar que todas las etiquetas requeridas estén presentes y coincidan
-        for key, value in required_labels.items():
-            if key not in node_labels or node_labels[key] != value:
-                matches_all = False
-                break
-        # Si todas las etiquetas coinciden, incluir nodo
-        if matches_all:
-            filtered_nodes.append(node)
-    
-    print(f"Label filtering: {len(all_nodes)} -> {len(filtered_nodes)} nodes")
-    return filtered_nodes
-
-# -----------------------------
-# Filtrar nodos por tolerancia a taints
-# -----------------------------
-def node_tolerates_taints(node: client.V1Node, pod: client.V1Pod) -> bool:
-    # Chequeo si el pod tolera todos los taints del nodo
-    taints = node.spec.taints or []
-    tolerations = pod.spec.tolerations or []
-    
-    if not taints:
-        return True
-    # Chequeo cada taint contra las tolerancias del pod
-    for taint in taints:
-        tolerated = False
-        # Chequeo cada tolerancia
-        for tol in tolerations:
-            # Chequeo si la tolerancia coincide con el taint
-            key_match = tol.key == taint.key
-            effect_match = (tol.effect == taint.effect or tol.effect == "NoExecute" or  tol.effect is None)
-            # Evaluar basado en operador
-            if tol.operator == "Exists":
-                if key_match and effect_match:
-                    tolerated = True
-                    break
-            elif tol.operator == "Equal":
-                if (key_match and effect_match and 
-                    tol.value == taint.value):
-                    tolerated = True
-                    break
-        # Si no se encontró tolerancia para este taint, el nodo no es tolerado
-        if not tolerated:
-            print(f"Node {node.metadata.name} rejected due to taint {taint.key}={taint.value}:{taint.effect}")
-            return False
-            
-    return True
-
-def filter_nodes_by_taints(nodes, pod: client.V1Pod):
-    # Filtrar nodos basados en tolerancia a taints
-    tolerable_nodes = []
-    # Chequea cada nodo por tolerancia a taints
-    for node in nodes:
-        if node_tolerates_taints(node, pod):
-            tolerable_nodes.append(node)
-    
-    print(f"Taint filtering: {len(nodes)} -> {len(tolerable_nodes)} nodes")
-    return tolerable_nodes
-
-
 # -----------------------------
 # Funciones de retry con backoff exponencial
 # -----------------------------
@@ -153,152 +79,95 @@ def bind_pod_with_retry(api: client.CoreV1Api, pod, target_name: str):
 
         raise
     
-def calculate_spread_score(node, pods, pod_labels_to_spread):
-    # Lista de pods corriendo en el nodo
-    running_pods = [p for p in pods if p.spec.node_name == node.metadata.name]
-    
-    if not running_pods:
-        return 100  # Si el nodo esta vacio, devuelve el puntaje maximo
-    
-    # Contar pods con etiquetas similares
-    similar_pod_count = 0
-    for running_pod in running_pods:
-        running_labels = running_pod.metadata.labels or {}
-        matches = True
-        for key, value in pod_labels_to_spread.items():
-            if running_labels.get(key) != value:
-                matches = False
-                break
-        if matches:
-            similar_pod_count += 1
-    
-    # Menos pods similares -> mejor puntaje
-    spread_score = max(0, 100 - (similar_pod_count * 20))
-    return spread_score
-
-#Elegir nodo considerando política de dispersión
-def choose_node_with_spread(api: client.CoreV1Api, pod, spread_labels=None):
-    
-    nodes = api.list_node().items
-    pods = api.list_pod_for_all_namespaces().items
-    
-    if not nodes:
-        raise RuntimeError("No nodes available")
-    
-    # Aplicar filtro de etiquetas si es necesario
-    if spread_labels:
-        nodes = filter_nodes_by_labels(api, spread_labels)
-    # Elimina nodos que no son tolerados por el pod
-    nodes = filter_nodes_by_taints(nodes, pod)
-    
-    if not nodes:
-        raise RuntimeError("No nodes match filtering criteria")
-    
-    # Scoring de nodos basado en múltiples factores
-    best_score = -1
-    best_node = None
-    
-    for node in nodes:
-        # Numero de pods en el nodo (carga)
-        pod_count = sum(1 for p in pods if p.spec.node_name == node.metadata.name)
-        #Penaliza nodos con mas pods
-        load_score = max(0, 100 - (pod_count * 10))
-        
-        # Dispersión de pods
-        spread_score = 50  # Puntaje base si no hay política de dispersión
-        if spread_labels:
-            spread_score = calculate_spread_score(node, pods, spread_labels)
-        
-        # Score conbinado (weighted)
-        total_score = (load_score * 0.6) + (spread_score * 0.4)
-        
-        print(f"Node {node.metadata.name}: load_score={load_score}, spread_score={spread_score}, total={total_score:.1f}")
-        
-        if total_score > best_score:
-            best_score = total_score
-            best_node = node.metadata.name
-    
-    if not best_node:
-        raise RuntimeError("Failed to select a node")
-
-    
-    return best_node
-
-# Selección de nodo mejorada
-def choose_node_enhanced(api: client.CoreV1Api, pod) -> str:
-    
-    # Definir políticas de scheduling
-    required_labels = {"env": "prod"}  
-    spread_policy = {"app": pod.metadata.labels.get("app")} if pod.metadata.labels else None
-    
-    try:
-        # Obtener y filtrar nodos
-        all_nodes = api.list_node().items
-        print(f"Total nodes available: {len(all_nodes)}")
-        
-        # Filtrado por etiquetas
-        label_filtered = filter_nodes_by_labels(api, required_labels)
-        
-        if not label_filtered:
-            raise RuntimeError("No nodes satisfy label requirements")
-        
-        # Filtrado de taints
-        taint_filtered = filter_nodes_by_taints(label_filtered, pod)
-        
-        if not taint_filtered:
-            raise RuntimeError("No nodes satisfy label and taint requirements")
-        
-        # Elegir nodo considerando política de dispersión
-        chosen_node = choose_node_with_spread(api, pod, spread_policy)
-
-        if chosen_node is None:
-            raise RuntimeError("No node could be chosen after scoring")
-        
-        print(f"[DEBUG] Chosen node: {chosen_node}")
-        
-        return chosen_node
-        
-    except Exception as e:
-        print(f"Node selection error: {e}")
-        raise
+# Intervalo del watch: en cada corte se revisan timeouts y backoff de los grupos
+GANG_POLL_SECONDS = 10
+
+def schedule_pod_groups(fw: Framework, gangs: GangQueue):
+    # Scheduling todo-o-nada de los grupos que llegan a min-member; un único
+    # snapshot sirve para contar el quórum y colocar todos los grupos
+    candidates = gangs.candidates()
+    if not candidates:
+        return
+    snapshot = fw.snapshot()
+    for group in candidates:
+        if not gangs.evaluate(group, snapshot):
+            continue
+        print(f"Scheduling pod group {group.key} ({len(group.pods)} pending, min {group.min_member})")
+        try:
+            placements = schedule_gang(fw, group, gangs.timeout, snapshot)
+            gangs.done(group)
+            print(f"Successfully scheduled pod group {group.key}: {placements}")
+        except Exception as e:
+            print(f"Failed to schedule pod group {group.key}: {e}")
+            gangs.backoff(group)
+
+def handle_pod_event(fw: Framework, gangs: GangQueue, event, scheduler_name: str):
+    obj = event.get('object')
+    if obj is None or not hasattr(obj, 'spec') or not hasattr(obj, 'metadata'):
+        return
+
+    pending = (obj.status.phase == "Pending" and
+               getattr(obj.spec, 'scheduler_name', None) == scheduler_name and
+               getattr(obj.spec, 'node_name', None) is None)
+
+    # Los pods de un pod group se juntan y se programan en bloque
+    if pod_group_of(obj) is not None:
+        try:
+            if pending and event.get('type') != "DELETED":
+                gangs.add(obj)
+            else:
+                gangs.remove(obj)
+        except ValueError as e:
+            print(f"Failed to queue pod {obj.metadata.name}: {e}")
+        schedule_pod_groups(fw, gangs)
+        return
+
+    if pending:
+        print(f"Scheduling pod: {obj.metadata.namespace}/{obj.metadata.name}")
+        try:
+            node_name = fw.schedule_and_bind(obj)
+            print(f"Successfully scheduled {obj.metadata.name} -> {node_name}")
+
+        except Exception as e:
+            print(f"Failed to schedule pod {obj.metadata.name}: {e}")
 
 def main_enhanced():
     """Enhanced scheduler main function"""
     parser = argparse.ArgumentParser()
     parser.add_argument("--scheduler-name", default="enhanced-scheduler-e")
     parser.add_argument("--kubeconfig", default=None)
+    parser.add_argument("--profile", default=None, help="Perfil JSON de plugins (opcional)")
+    parser.add_argument("--gang-timeout", type=float, default=30.0,
+                        help="Segundos para reunir y colocar un pod group completo")
     args = parser.parse_args()
 
     api = load_client(args.kubeconfig)
+    fw = Framework(load_profile(args.profile), api=api, bind_fn=bind_pod_with_retry)
     print(f"Enhanced scheduler starting...")
 
+    gangs = GangQueue(timeout=args.gang_timeout)
     w = watch.Watch()
 
-    for event in w.stream(api.list_pod_for_all_namespaces):
-        obj = event.get('object')
-        if obj is None or not hasattr(obj, 'spec') or not hasattr(obj, 'metadata'):
-                continue
-
-        if (obj.status.phase == "Pending" and
-             getattr(obj.spec, 'scheduler_name', None) == args.scheduler_name and
-             getattr(obj.spec, 'node_name', None) is None):
-
-             print(f"Scheduling pod: {obj.metadata.namespace}/{obj.metadata.name}")
-             try:
-                 node_name = choose_node_enhanced(api, obj)
-                 print(f"[DEBUG] node_name resolved: {node_name}")
-                 print(f"[DEBUG] pod.metadata.name: {obj.metadata.name}")
-                 print(f"[DEBUG] node before bind: {node_name}")
-                 if not node_name or not obj.metadata.name:
-                     print(f"[ERROR] Cannot bind pod: node_name={node_name}, pod_name={obj.metadata.name}")
-                     continue
-                 
-                 bind_pod_with_retry(api, obj, node_name)
-                 print(f"Successfully scheduled {obj.metadata.name} -> {node_name}")
+    resource_version = None
+
+    while True:
+        # Se retoma el watch desde el último resourceVersion para no re-listar
+        # todo el cluster en cada corte; ante un 410 (Gone) se vuelve a listar
+        try:
+            for event in w.stream(api.list_pod_for_all_namespaces, timeout_seconds=GANG_POLL_SECONDS,
+                                  resource_version=resource_version):
+                handle_pod_event(fw, gangs, event, args.scheduler_name)
+            resource_version = w.resource_version
+        except client.rest.ApiException as e:
+            if e.status != 410:
+                raise
+            print(f"[WARNING] Watch resourceVersion expired, re-listing pods: {e.reason}")
+            resource_version = None
+            # Los pods borrados durante el corte no envían DELETED
+            gangs.reconcile(fw.snapshot())
+
+        schedule_pod_groups(fw, gangs)
 
-             except Exception as e:
-                print(f"Failed to schedule pod {obj.metadata.name}: {e}")
-             
 
 if __name__ == "__main__":
     main_enhanced()